@@ -8,23 +8,591 @@ in RAG systems or technical documentation.
 """
 
 import os
+import io
 import argparse
 import json
+import hashlib
+import shutil
+import subprocess
 import sys
-from typing import List, Optional
-from pdf2image import convert_from_path
-from PIL import Image
+import tempfile
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# pdf2image and Pillow are imported where they are used, so that --help and
+# argument errors do not pay for loading them
+if TYPE_CHECKING:
+    from PIL import Image
 
 # --- Configuration ---
 # Default directory where extracted images will be saved
 DEFAULT_OUTPUT_DIR = os.getenv("SPATIAL_OUTPUT_DIR", "extracted_assets")
+# Rasterization resolution; 150 DPI keeps labels legible at a fraction of the pixels
+DEFAULT_DPI = 150
+# Output image formats and their file extensions
+OUTPUT_FORMATS = {"png": "png", "jpeg": "jpg"}
+DEFAULT_FORMAT = "png"
+JPEG_QUALITY = 88
+# zlib level for PNG output: 1 encodes several times faster than Pillow's default 6
+# for files only slightly larger
+PNG_COMPRESS_LEVEL = int(os.getenv("PNG_COMPRESS_LEVEL", "1"))
+# Gray levels at or above this value count as background when trimming margins
+TRIM_THRESHOLD = 250
+# Asset types that are rendered in grayscale (line art carries no color information)
+# with pdftocairo, which rasterizes vector line art faster and cleaner than
+# pdftoppm's splash backend
+ASSET_TYPES = ["stats_graph", "wiring_diagram", "technical_drawing", "product_photo"]
+LINE_ART_TYPES = {"wiring_diagram", "technical_drawing"}
+# Cropping engines: Pillow (default) or libvips via the optional pyvips package
+ENGINES = ["pil", "vips"]
+DEFAULT_ENGINE = "pil"
+# Rasterized pages are memoized here, keyed by PDF content hash. Pages are stored
+# uncompressed (several MB each); set PRISM_CACHE_DIR to an empty string to disable
+PAGE_CACHE_DIR = os.getenv(
+    "PRISM_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "prism")
+)
+
+def _file_md5(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Returns the hex MD5 digest of a file, reading it in fixed-size chunks."""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _page_cache_path(
+    pdf_hash: str,
+    page_num: int,
+    dpi: int,
+    line_art: bool
+) -> str:
+    """Returns the cache location of a rasterized page for the given render settings."""
+    # Pages are cached uncompressed: poppler writes them without any encoding
+    # step and Pillow reads them back without decompression. Line art is rendered
+    # in grayscale by pdftocairo, which has no PPM output, so it is cached as
+    # uncompressed TIFF. Pages are rendered from their CropBox ("crop"), which
+    # older MediaBox entries lack
+    if line_art:
+        filename = f"{page_num}_{dpi}dpi_crop_cairo_gray.tif"
+    else:
+        filename = f"{page_num}_{dpi}dpi_crop.ppm"
+    return os.path.join(PAGE_CACHE_DIR, pdf_hash, filename)
+
+def _page_size_points(pdf_path: str, page_num: int) -> Tuple[float, float]:
+    """
+    Returns the rendered (width, height) of a PDF page in points (1/72 inch),
+    taking the page rotation into account. pdfinfo reports the CropBox size,
+    which is the box every render uses.
+    """
+    from pdf2image import pdfinfo_from_path
+
+    info = pdfinfo_from_path(pdf_path, first_page=page_num, last_page=page_num)
+
+    # pdfinfo pads per-page keys for alignment, e.g. "Page    5 size"
+    fields = {" ".join(key.split()): value for key, value in info.items()}
+    size = fields.get(f"Page {page_num} size", fields.get("Page size"))
+    if not size:
+        raise ValueError(f"Page {page_num} not found in {pdf_path}")
+
+    # Value format: "612 x 792 pts (letter)"
+    width_str, _, height_str = size.split()[:3]
+    width, height = float(width_str), float(height_str)
+
+    rotation = fields.get(f"Page {page_num} rot", fields.get("Page rot", "0"))
+    if int(float(rotation)) % 180:
+        width, height = height, width
+    return width, height
+
+def _render_region(
+    pdf_path: str,
+    page_num: int,
+    left: int,
+    top: int,
+    right: int,
+    bottom: int,
+    dpi: int = DEFAULT_DPI,
+    line_art: bool = False,
+    fmt: str = DEFAULT_FORMAT
+) -> bytes:
+    """
+    Renders only the given whole-pixel window of a PDF page using the -x/-y/-W/-H
+    options of pdftoppm (or, for line art, grayscale pdftocairo) and returns
+    the image bytes in `fmt`: "jpeg" or "png" (ready to be written as the
+    final asset) or raw "ppm". pdftocairo cannot write PPM and returns PNG
+    bytes instead.
+    """
+    renderer = "pdftocairo" if line_art else "pdftoppm"
+    command = [renderer, "-r", str(dpi), "-f", str(page_num), "-l", str(page_num)]
+    command += [
+        "-x", str(left), "-y", str(top), "-W", str(right - left), "-H", str(bottom - top)
+    ]
+    if fmt == "jpeg":
+        command += ["-jpeg", "-jpegopt", f"quality={JPEG_QUALITY}"]
+    elif fmt == "png" or line_art:
+        command.append("-png")
+    if line_art:
+        command.append("-gray")
+    # Render the CropBox (the visible page, whose size pdfinfo reports) rather
+    # than the MediaBox, so the window lines up with the page size it was computed from
+    command.append("-cropbox")
+
+    # Without an output root pdftoppm writes the single page to stdout;
+    # pdftocairo needs an explicit "-" and -singlefile
+    if line_art:
+        command += ["-singlefile", pdf_path, "-"]
+    else:
+        command.append(pdf_path)
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0 or not result.stdout:
+        raise RuntimeError(
+            f"{renderer} failed on page {page_num}: "
+            f"{result.stderr.decode('utf8', 'ignore').strip()}"
+        )
+    return result.stdout
+
+def _cache_page_range(
+    pdf_path: str,
+    cache_paths: Dict[int, str],
+    dpi: int,
+    line_art: bool,
+    thread_count: int = 1
+) -> bool:
+    """
+    Renders a contiguous range of PDF pages into the page cache with a single
+    pdf2image call, split across `thread_count` parallel poppler processes.
+    Fresh renders are written by poppler straight into the cache, without an
+    in-memory copy. Returns False when the cache directory is not writable.
+    """
+    from pdf2image import convert_from_path
+
+    first_page, last_page = min(cache_paths), max(cache_paths)
+    cache_dir = os.path.dirname(cache_paths[first_page])
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=cache_dir)
+    except OSError as e:
+        print(f"WARNING: Unable to cache pages {first_page}-{last_page}: {e}")
+        return False
+
+    try:
+        # Note: pdf2image uses 1-based indexing for page selection
+        paths = convert_from_path(
+            pdf_path,
+            dpi=dpi,
+            output_folder=tmp_dir,
+            first_page=first_page,
+            last_page=last_page,
+            grayscale=line_art,
+            fmt="tiff" if line_art else "ppm",
+            use_pdftocairo=line_art,
+            use_cropbox=True,
+            thread_count=thread_count,
+            single_file=first_page == last_page,
+            paths_only=True
+        )
+        if len(paths) != last_page - first_page + 1:
+            raise RuntimeError(f"Failed to convert PDF pages {first_page}-{last_page} to images.")
+
+        # Paths come back in page order; publish atomically so readers never see a partial page
+        for page_num, path in zip(range(first_page, last_page + 1), paths):
+            os.replace(path, cache_paths[page_num])
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return True
+
+def _cache_page(
+    pdf_path: str,
+    page_num: int,
+    dpi: int,
+    line_art: bool,
+    cache_path: str
+) -> Optional[str]:
+    """
+    Ensures a full rasterized PDF page exists in the page cache and returns its
+    path, or None when the cache directory is not writable.
+    """
+    if os.path.exists(cache_path):
+        return cache_path
+    if not _cache_page_range(pdf_path, {page_num: cache_path}, dpi, line_art):
+        return None
+    return cache_path
+
+def _cache_pages(
+    pdf_path: str,
+    cache_paths: Dict[int, str],
+    dpi: int,
+    line_art: bool
+) -> None:
+    """
+    Renders several pages into the page cache in parallel. Each run of
+    contiguous pages is rendered by one pdf2image call and separate runs are
+    rendered concurrently, sharing a budget of one poppler process per core.
+    Failures are reported and left for the per-page fallback to retry.
+    """
+    runs: List[List[int]] = []
+    for page_num in sorted(cache_paths):
+        if runs and page_num == runs[-1][-1] + 1:
+            runs[-1].append(page_num)
+        else:
+            runs.append([page_num])
+
+    # At most cpu_count runs render at once, each with an equal share of the
+    # cores, so the total number of poppler processes never exceeds cpu_count
+    cpu_count = os.cpu_count() or 1
+    threads_per_run = max(1, cpu_count // len(runs))
+    with ThreadPoolExecutor(max_workers=min(cpu_count, len(runs))) as executor:
+        futures = {
+            executor.submit(
+                _cache_page_range,
+                pdf_path,
+                {page_num: cache_paths[page_num] for page_num in run},
+                dpi,
+                line_art,
+                min(threads_per_run, len(run))
+            ): run
+            for run in runs
+        }
+        for future, run in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                print(f"WARNING: Failed to pre-render pages {run[0]}-{run[-1]}: {e}")
+
+def _render_page(
+    pdf_path: str,
+    page_num: int,
+    dpi: int,
+    line_art: bool,
+    cache_path: Optional[str]
+) -> Optional["Image.Image"]:
+    """
+    Returns a full rasterized PDF page, served from the page cache. Cached
+    pages are opened lazily, so the page is decoded once (on the first crop)
+    and never re-encoded. Without a `cache_path` the page is rendered in memory.
+    """
+    from pdf2image import convert_from_path
+    from PIL import Image
+
+    page_path = cache_path and _cache_page(pdf_path, page_num, dpi, line_art, cache_path)
+    if page_path:
+        return Image.open(page_path)
+
+    images = convert_from_path(
+        pdf_path,
+        dpi=dpi,
+        first_page=page_num,
+        last_page=page_num,
+        grayscale=line_art,
+        use_pdftocairo=line_art,
+        use_cropbox=True
+    )
+    return images[0] if images else None
+
+def _padded_bboxes(bboxes: np.ndarray) -> np.ndarray:
+    """
+    Expands normalized [ymin, xmin, ymax, xmax] boxes (one per row of an (N, 4)
+    array) by a 5% safety margin (to avoid tight crops of labels/axes) and
+    clamps them to the 0-1000 range.
+    """
+    pads = (bboxes[:, 2:] - bboxes[:, :2]) * 0.05
+    padded = np.hstack((bboxes[:, :2] - pads, bboxes[:, 2:] + pads))
+    return np.clip(padded, 0, 1000, out=padded)
+
+def _to_pixels(bboxes: np.ndarray, width: float, height: float) -> np.ndarray:
+    """Converts normalized boxes into pixel-level [left, top, right, bottom] rows."""
+    return bboxes[:, [1, 0, 3, 2]] * (np.array([width, height, width, height]) / 1000)
+
+def _to_windows(boxes: np.ndarray, width: float, height: float) -> np.ndarray:
+    """
+    Snaps pixel [left, top, right, bottom] rows outward to whole pixels, clamped
+    to the image and at least one pixel wide and high, in one vectorized pass.
+    """
+    windows = np.hstack((np.floor(boxes[:, :2]), np.ceil(boxes[:, 2:])))
+    np.clip(windows, 0, [width, height, width, height], out=windows)
+    np.maximum(windows[:, 2:], windows[:, :2] + 1, out=windows[:, 2:])
+    return windows.astype(np.int64)
+
+def pil_view(img: "Image.Image") -> np.ndarray:
+    """
+    Returns the pixels of an image as a read-only NumPy array of shape
+    (height, width) or (height, width, bands), for array-level passes over a crop.
+
+    Pillow exposes no public view of its internal buffer, so exporting the pixels
+    costs one copy; np.asarray wraps that export directly and avoids the extra
+    full-image copy np.array makes. The array owns its data and stays valid
+    after the image is closed, but cannot be written to.
+    """
+    return np.asarray(img)
+
+def _trim(img: "Image.Image") -> "Image.Image":
+    """
+    Trims near-white margins from a crop using a single vectorized row/column
+    scan. Returns the image unchanged when there is nothing to trim.
+    """
+    gray = img if img.mode == "L" else img.convert("L")
+    mask = pil_view(gray) < TRIM_THRESHOLD
+    ys = np.flatnonzero(mask.any(axis=1))
+    xs = np.flatnonzero(mask.any(axis=0))
+    if not ys.size:
+        return img
+
+    box = (int(xs[0]), int(ys[0]), int(xs[-1]) + 1, int(ys[-1]) + 1)
+    if box == (0, 0, *img.size):
+        return img
+    return img.crop(box)
+
+def _crop(img: "Image.Image", box: List[float]) -> "Image.Image":
+    """Crops an image, returning it unchanged when the box covers it entirely."""
+    left, top, right, bottom = box
+    width, height = img.size
+    if left <= 0.5 and top <= 0.5 and right >= width - 0.5 and bottom >= height - 0.5:
+        return img
+    return img.crop(box)
+
+def _save_asset(
+    img: "Image.Image",
+    output_dir: str,
+    output_name: str,
+    fmt: str,
+    png_level: int = PNG_COMPRESS_LEVEL
+) -> str:
+    """Saves a cropped asset as PNG or JPEG and returns its path."""
+    output_path = os.path.join(output_dir, f"{output_name}.{OUTPUT_FORMATS[fmt]}")
+    if fmt == "jpeg":
+        img.save(output_path, "JPEG", quality=JPEG_QUALITY, optimize=False, progressive=False)
+    else:
+        img.save(output_path, "PNG", compress_level=png_level, optimize=False)
+    return output_path
+
+def _save_encoded_asset(data: bytes, output_dir: str, output_name: str, fmt: str) -> str:
+    """Writes an already encoded asset to disk as-is and returns its path."""
+    output_path = os.path.join(output_dir, f"{output_name}.{OUTPUT_FORMATS[fmt]}")
+    with open(output_path, "wb") as f:
+        f.write(data)
+    return output_path
+
+def _save_vips_crop(
+    page_path: str,
+    bbox: np.ndarray,
+    output_dir: str,
+    output_name: str,
+    fmt: str,
+    trim: bool = False,
+    png_level: int = PNG_COMPRESS_LEVEL
+) -> str:
+    """
+    Crops an asset from a cached page file with libvips and saves it. The page
+    is streamed top to bottom through a fused load/crop/save pipeline, so the
+    full decoded page never materializes in memory.
+    """
+    import pyvips  # Optional dependency, only needed for the vips engine
+
+    page = pyvips.Image.new_from_file(page_path, access="sequential")
+    left, top, right, bottom = _to_windows(
+        _to_pixels(bbox[np.newaxis], page.width, page.height), page.width, page.height
+    )[0].tolist()
+    cropped = page.crop(left, top, right - left, bottom - top)
+
+    if trim:
+        # Trimming reads the crop twice, which a sequential pipeline cannot do
+        cropped = cropped.copy_memory()
+        trim_left, trim_top, trim_width, trim_height = cropped.find_trim(
+            threshold=255 - TRIM_THRESHOLD, background=[255] * cropped.bands
+        )
+        if trim_width and trim_height:
+            cropped = cropped.crop(trim_left, trim_top, trim_width, trim_height)
+
+    output_path = os.path.join(output_dir, f"{output_name}.{OUTPUT_FORMATS[fmt]}")
+    if fmt == "jpeg":
+        cropped.jpegsave(output_path, Q=JPEG_QUALITY)
+    else:
+        cropped.pngsave(output_path, compression=png_level)
+    return output_path
+
+def extract_spatial_assets(
+    pdf_path: str,
+    items: List[Dict[str, Any]],
+    output_dir: str = DEFAULT_OUTPUT_DIR,
+    dpi: int = DEFAULT_DPI,
+    fmt: str = DEFAULT_FORMAT,
+    engine: str = DEFAULT_ENGINE,
+    trim: bool = False,
+    png_level: int = PNG_COMPRESS_LEVEL,
+    use_cache: bool = True
+) -> List[Optional[str]]:
+    """
+    Extracts several regions from a PDF, rasterizing each page at most once.
+
+    Pages holding a single asset render only the crop window; pages holding
+    several assets are rendered once, cached on disk and cropped in memory
+    for each of them. Cached pages are reused for any later crop. With the
+    cache disabled, full pages are rendered in memory instead.
+    
+    Args:
+        pdf_path: Path to the source PDF file.
+        items: Assets to extract, each a dict with keys "page" (1-based page number),
+            "bbox" (normalized [ymin, xmin, ymax, xmax], 0 to 1000) and "name"
+            (output filename without extension), plus an optional "type" (asset type).
+        output_dir: Directory where the images will be saved.
+        dpi: Rasterization resolution.
+        fmt: Output image format, "png" or "jpeg".
+        engine: Cropping engine for full-page renders, "pil" or "vips" (requires pyvips).
+        trim: Whether to trim the remaining white margins around each asset.
+        png_level: zlib compression level (0-9) for PNG output.
+        use_cache: Whether to read and write the page cache (PAGE_CACHE_DIR).
+        
+    Returns:
+        A list aligned with `items` holding the path to each saved image file,
+        or None for assets that could not be extracted.
+    """
+    from PIL import Image
+
+    results: List[Optional[str]] = [None] * len(items)
+
+    if not os.path.exists(pdf_path):
+        print(f"ERROR: Source PDF not found: {pdf_path}")
+        return results
+
+    # Group valid items by page so that each page is rasterized only once;
+    # invalid boxes are skipped individually without affecting the others
+    pages: Dict[int, List[int]] = defaultdict(list)
+    bboxes: Dict[int, List[float]] = {}
+    for index, item in enumerate(items):
+        bbox = item["bbox"]
+        if not isinstance(bbox, (list, tuple)) or len(bbox) != 4:
+            print(f"ERROR: Bounding box must contain exactly 4 coordinates. Got: {bbox}")
+            continue
+        try:
+            bboxes[index] = [float(coord) for coord in bbox]
+        except (TypeError, ValueError):
+            print(f"ERROR: Bounding box must contain numeric coordinates. Got: {bbox}")
+            continue
+        pages[item["page"]].append(index)
+
+    # Pad and clamp every valid box in one vectorized pass (rows of invalid items stay zero)
+    padded = np.zeros((len(items), 4))
+    if bboxes:
+        padded[list(bboxes)] = _padded_bboxes(np.array(list(bboxes.values())))
+
+    # Create output directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
+
+    # The page cache is keyed by a hash of the whole PDF, which only pays off when
+    # some page needs a full render; lone assets render just their crop window
+    use_cache = (
+        use_cache
+        and bool(PAGE_CACHE_DIR)
+        and any(len(indices) > 1 for indices in pages.values())
+    )
+    pdf_hash = _file_md5(pdf_path) if use_cache else None
+
+    # Render in grayscale with pdftocairo only when every asset on the page is line art
+    page_line_art = {
+        page_num: all(items[index].get("type") in LINE_ART_TYPES for index in indices)
+        for page_num, indices in pages.items()
+    }
+
+    # Pages holding several assets need a full render: rasterize the uncached
+    # ones up front, in parallel, grouped by render settings
+    pending: Dict[bool, Dict[int, str]] = defaultdict(dict)
+    for page_num, indices in pages.items():
+        if use_cache and len(indices) > 1:
+            line_art = page_line_art[page_num]
+            cache_path = _page_cache_path(pdf_hash, page_num, dpi, line_art)
+            if not os.path.exists(cache_path):
+                pending[line_art][page_num] = cache_path
+    for line_art, cache_paths in pending.items():
+        _cache_pages(pdf_path, cache_paths, dpi, line_art)
+
+    for page_num, indices in sorted(pages.items()):
+        try:
+            print(f"Processing {pdf_path} (Page {page_num}, {len(indices)} asset(s))...")
+
+            line_art = page_line_art[page_num]
+            cache_path = (
+                _page_cache_path(pdf_hash, page_num, dpi, line_art)
+                if use_cache else None
+            )
+
+            if len(indices) == 1 and not (cache_path and os.path.exists(cache_path)):
+                # A lone asset only needs its crop window rendered
+                index = indices[0]
+                width_pt, height_pt = _page_size_points(pdf_path, page_num)
+                width, height = width_pt * dpi / 72, height_pt * dpi / 72
+                box = _to_windows(_to_pixels(padded[[index]], width, height), width, height)[0]
+                # JPEG windows are written as rendered, without re-encoding. PNG
+                # windows (poppler has no compression level option) and windows
+                # to trim (which need lossless input) are rendered as raw PPM
+                render_fmt = "jpeg" if fmt == "jpeg" and not trim else "ppm"
+                data = _render_region(
+                    pdf_path, page_num, *box.tolist(),
+                    dpi=dpi, line_art=line_art, fmt=render_fmt
+                )
+                if render_fmt == fmt:
+                    results[index] = _save_encoded_asset(
+                        data, output_dir, items[index]["name"], fmt
+                    )
+                else:
+                    cropped_img = Image.open(io.BytesIO(data))
+                    if trim:
+                        cropped_img = _trim(cropped_img)
+                    results[index] = _save_asset(
+                        cropped_img, output_dir, items[index]["name"], fmt, png_level
+                    )
+            elif engine == "vips" and cache_path and _cache_page(
+                pdf_path, page_num, dpi, line_art, cache_path
+            ):
+                for index in indices:
+                    results[index] = _save_vips_crop(
+                        cache_path,
+                        padded[index],
+                        output_dir,
+                        items[index]["name"],
+                        fmt,
+                        trim=trim,
+                        png_level=png_level
+                    )
+            else:
+                img = _render_page(pdf_path, page_num, dpi, line_art, cache_path)
+                if img is None:
+                    print(f"ERROR: Failed to convert PDF page {page_num} to image.")
+                    continue
+
+                width, height = img.size
+                boxes = _to_pixels(padded[indices], width, height)
+                for index, box in zip(indices, boxes.tolist()):
+                    cropped_img = _crop(img, box)
+                    if trim:
+                        cropped_img = _trim(cropped_img)
+                    results[index] = _save_asset(
+                        cropped_img, output_dir, items[index]["name"], fmt, png_level
+                    )
+
+            for index in indices:
+                if results[index]:
+                    print(f"✅ SUCCESS: Asset extracted to: {results[index]}")
+
+        except Exception as e:
+            print(f"FAILED to extract assets from page {page_num}: {e}")
+
+    return results
 
 def extract_spatial_asset(
     pdf_path: str, 
     page_num: int, 
     bbox: List[float], 
     output_name: str,
-    output_dir: str = DEFAULT_OUTPUT_DIR
+    output_dir: str = DEFAULT_OUTPUT_DIR,
+    dpi: int = DEFAULT_DPI,
+    fmt: str = DEFAULT_FORMAT,
+    asset_type: Optional[str] = None,
+    engine: str = DEFAULT_ENGINE,
+    trim: bool = False,
+    png_level: int = PNG_COMPRESS_LEVEL,
+    use_cache: bool = True
 ) -> Optional[str]:
     """
     Extracts a specific region from a PDF page based on normalized coordinates.
@@ -35,78 +603,113 @@ def extract_spatial_asset(
         bbox: List of 4 normalized coordinates [ymin, xmin, ymax, xmax] (0 to 1000).
         output_name: Filename for the extracted image (without extension).
         output_dir: Directory where the image will be saved.
+        dpi: Rasterization resolution.
+        fmt: Output image format, "png" or "jpeg".
+        asset_type: Optional manifest asset type; line art is rendered in grayscale
+            with pdftocairo.
+        engine: Cropping engine for cached full-page renders, "pil" or "vips"
+            (requires pyvips).
+        trim: Whether to trim the remaining white margins around the asset.
+        png_level: zlib compression level (0-9) for PNG output.
+        use_cache: Whether to read and write the page cache (PAGE_CACHE_DIR).
         
     Returns:
-        The path to the saved PNG file if successful, else None.
+        The path to the saved image file if successful, else None.
     """
-    if not os.path.exists(pdf_path):
-        print(f"ERROR: Source PDF not found: {pdf_path}")
-        return None
-
-    if len(bbox) != 4:
-        print(f"ERROR: Bounding box must contain exactly 4 coordinates. Got: {bbox}")
-        return None
-
-    try:
-        # Create output directory if it doesn't exist
-        os.makedirs(output_dir, exist_ok=True)
-
-        print(f"Processing {pdf_path} (Page {page_num})...")
+    item = {"page": page_num, "bbox": bbox, "name": output_name, "type": asset_type}
+    return extract_spatial_assets(
+        pdf_path,
+        [item],
+        output_dir,
+        dpi=dpi,
+        fmt=fmt,
+        engine=engine,
+        trim=trim,
+        png_level=png_level,
+        use_cache=use_cache
+    )[0]
 
-        # 1. Convert specific PDF page to high-resolution image
-        # Note: pdf2image uses 1-based indexing for page selection
-        images = convert_from_path(pdf_path, first_page=page_num, last_page=page_num)
-        if not images:
-            print(f"ERROR: Failed to convert PDF page {page_num} to image.")
-            return None
-        
-        img = images[0]
-        width, height = img.size
-        
-        # 2. De-normalize coordinates (0-1000 scale to pixel scale)
-        ymin, xmin, ymax, xmax = bbox
-        
-        # Add a 5% safety margin (padding) to avoid tight crops of labels/axes
-        h_padding = (ymax - ymin) * 0.05
-        w_padding = (xmax - xmin) * 0.05
-        
-        ymin = max(0, ymin - h_padding)
-        xmin = max(0, xmin - w_padding)
-        ymax = min(1000, ymax + h_padding)
-        xmax = min(1000, xmax + w_padding)
-        
-        # Calculate pixel-level boundaries
-        left = (xmin / 1000) * width
-        top = (ymin / 1000) * height
-        right = (xmax / 1000) * width
-        bottom = (ymax / 1000) * height
-        
-        # 3. Perform the crop
-        cropped_img = img.crop((left, top, right, bottom))
-        
-        # 4. Save as high-quality PNG
-        output_path = os.path.join(output_dir, f"{output_name}.png")
-        cropped_img.save(output_path, "PNG")
-        
-        print(f"✅ SUCCESS: Asset extracted to: {output_path}")
-        return output_path
+def load_manifest_items(manifest_path: str) -> List[Dict[str, Any]]:
+    """
+    Reads a spatial manifest (as produced by spatial_manifest_generator.py) and
+    converts its assets into extraction items named <pdf>_p<page>_<index>_<type>.
+    Assets without a 4-coordinate bounding box are reported and skipped.
+    """
+    with open(manifest_path) as f:
+        manifest = json.load(f)
 
-    except Exception as e:
-        print(f"FAILED to extract asset: {e}")
-        return None
+    stem = os.path.splitext(manifest.get("source_pdf") or os.path.basename(manifest_path))[0]
+    items = []
+    for index, asset in enumerate(manifest.get("assets", []), start=1):
+        page_num = asset["page_number"]
+        bbox = asset.get("bounding_box")
+        if not isinstance(bbox, list) or len(bbox) != 4:
+            print(f"ERROR: Bounding box must contain exactly 4 coordinates. Got: {bbox}")
+            continue
+        items.append({
+            "page": page_num,
+            "bbox": bbox,
+            "name": f"{stem}_p{page_num}_{index:02d}_{asset.get('type', 'asset')}",
+            "type": asset.get("type")
+        })
+    return items
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Extract a visual asset from a PDF using spatial coordinates."
+        description="Extract visual assets from a PDF using spatial coordinates."
     )
     parser.add_argument("--pdf", required=True, help="Path to the source PDF document.")
-    parser.add_argument("--page", type=int, required=True, help="1-based page number.")
+    parser.add_argument(
+        "--manifest",
+        help="Path to a spatial manifest JSON; extracts every asset it lists."
+    )
+    parser.add_argument("--page", type=int, help="1-based page number.")
     parser.add_argument(
         "--bbox", 
-        required=True, 
         help='JSON list of coordinates [ymin, xmin, ymax, xmax], e.g., "[100, 50, 400, 950]"'
     )
-    parser.add_argument("--name", required=True, help="Output filename (no extension).")
+    parser.add_argument("--name", help="Output filename (no extension).")
+    parser.add_argument(
+        "--type",
+        choices=ASSET_TYPES,
+        help="Asset type from the manifest; line art is rendered in grayscale with pdftocairo."
+    )
+    parser.add_argument(
+        "--dpi",
+        type=int,
+        default=DEFAULT_DPI,
+        help=f"Rasterization resolution (default: {DEFAULT_DPI})"
+    )
+    parser.add_argument(
+        "--fmt",
+        choices=sorted(OUTPUT_FORMATS),
+        default=DEFAULT_FORMAT,
+        help=f"Output image format (default: {DEFAULT_FORMAT})"
+    )
+    parser.add_argument(
+        "--png-level",
+        type=int,
+        choices=range(10),
+        default=PNG_COMPRESS_LEVEL,
+        metavar="0-9",
+        help=f"zlib compression level for PNG output (default: {PNG_COMPRESS_LEVEL})"
+    )
+    parser.add_argument(
+        "--trim",
+        action="store_true",
+        help="Trim the white margins left around each asset after cropping."
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default=DEFAULT_ENGINE,
+        help=f"Cropping engine for full-page renders; vips requires pyvips (default: {DEFAULT_ENGINE})"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Do not read or write the rasterized page cache ({PAGE_CACHE_DIR or 'disabled'})"
+    )
     parser.add_argument(
         "--outdir", 
         default=DEFAULT_OUTPUT_DIR, 
@@ -114,6 +717,46 @@ def main():
     )
     
     args = parser.parse_args()
+
+    if args.engine == "vips" and (args.no_cache or not PAGE_CACHE_DIR):
+        print("WARNING: --engine vips crops cached pages; with the cache disabled Pillow is used.")
+    elif args.engine == "vips":
+        try:
+            import pyvips
+        except (ImportError, OSError) as e:
+            print(f"ERROR: --engine vips requires pyvips and libvips: {e}")
+            sys.exit(1)
+
+        # Cached pages are PPM (TIFF for line art), which minimal libvips builds may leave out
+        for loader in ("ppmload", "tiffload"):
+            if not pyvips.type_find("VipsForeignLoad", loader):
+                print("ERROR: --engine vips requires a libvips build with PPM and TIFF support.")
+                sys.exit(1)
+
+    if args.manifest:
+        try:
+            items = load_manifest_items(args.manifest)
+        except (OSError, json.JSONDecodeError, KeyError) as e:
+            print(f"ERROR: Unable to read manifest {args.manifest}: {e}")
+            sys.exit(1)
+
+        results = extract_spatial_assets(
+            args.pdf,
+            items,
+            output_dir=args.outdir,
+            dpi=args.dpi,
+            fmt=args.fmt,
+            engine=args.engine,
+            trim=args.trim,
+            png_level=args.png_level,
+            use_cache=not args.no_cache
+        )
+        extracted = sum(1 for path in results if path)
+        print(f"Extracted {extracted}/{len(items)} assets to {args.outdir}")
+        return
+
+    if args.page is None or args.bbox is None or args.name is None:
+        parser.error("--page, --bbox and --name are required unless --manifest is given")
     
     try:
         bbox_list = json.loads(args.bbox)
@@ -126,7 +769,14 @@ def main():
         page_num=args.page, 
         bbox=bbox_list, 
         output_name=args.name,
-        output_dir=args.outdir
+        output_dir=args.outdir,
+        dpi=args.dpi,
+        fmt=args.fmt,
+        asset_type=args.type,
+        engine=args.engine,
+        trim=args.trim,
+        png_level=args.png_level,
+        use_cache=not args.no_cache
     )
 
 if __name__ == "__main__":
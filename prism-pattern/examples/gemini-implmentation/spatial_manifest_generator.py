@@ -9,149 +9,446 @@ The resulting manifest includes bounding box coordinates, allowing for precise
 image extraction and improved RAG (Retrieval-Augmented Generation) performance.
 """
 
-import vertexai
-from vertexai.generative_models import GenerativeModel, Part
 import os
 import json
+import time
+import functools
+import threading
+import hashlib
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import sys
 
+# The Vertex AI and Cloud Storage SDKs (gRPC, protobuf) are imported where they
+# are used, so that --help and argument errors return without loading them
+
 # --- Environment Configuration ---
 # These variables should be set in your environment or .env file
 PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT")
 LOCATION = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
 # Defaulting to the latest Pro Vision model for high-precision technical document analysis
 MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-3-pro-preview")
+# GCS bucket used to stage PDFs so Gemini can read them by URI
+STAGING_BUCKET = os.getenv("STAGING_BUCKET")
+# Seconds between batch prediction job status checks
+BATCH_POLL_SECONDS = int(os.getenv("BATCH_POLL_SECONDS", "30"))
+# Maximum number of concurrent synchronous Gemini requests
+MAX_WORKERS = int(os.getenv("MANIFEST_MAX_WORKERS", "8"))
+
+# Response schema enforced by the model's structured decoding. "source_pdf" and
+# "created_at" are stamped locally, so the model does not spend tokens on them.
+ASSET_TYPES = ["stats_graph", "wiring_diagram", "technical_drawing", "product_photo"]
+RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "product_name": {"type": "STRING", "description": "Primary product name"},
+        "product_description": {"type": "STRING", "description": "1-2 sentence technical summary"},
+        "assets": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "page_number": {"type": "INTEGER"},
+                    "type": {"type": "STRING", "enum": ASSET_TYPES},
+                    "model_name": {"type": "STRING", "description": "Specific product variant name"},
+                    "product_code": {"type": "STRING", "description": "12NC or SKU if available"},
+                    "description": {"type": "STRING", "description": "Detailed description of the asset content"},
+                    "bounding_box": {
+                        "type": "ARRAY",
+                        "items": {"type": "INTEGER"},
+                        "min_items": 4,
+                        "max_items": 4,
+                        "description": "[ymin, xmin, ymax, xmax] normalized to 0-1000"
+                    }
+                },
+                "required": [
+                    "page_number", "type", "model_name", "product_code", "description", "bounding_box"
+                ]
+            }
+        }
+    },
+    "required": ["product_name", "product_description", "assets"]
+}
+
+# Configure model for structured JSON output
+GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": RESPONSE_SCHEMA}
+
+# System instruction defining the business rules (the schema is enforced separately).
+# It is identical for every request, so the server can reuse it from its prompt
+# cache; anything specific to a PDF belongs in the user turn.
+SYSTEM_PROMPT = """You are a Computer Vision Metadata Engine for Technical Documentation.
+Your goal is to analyze the provided PDF and generate a structured "Image Manifest" of all significant visual assets.
+
+TARGET ASSET CLASSIFICATIONS:
+- Wiring Diagrams: Schematics showing electrical connections and terminals.
+- Dimensional Drawings: Technical sketches providing physical measurements.
+- Performance Graphs: Charts showing efficiency, operating windows, or spectral response.
+- Product Photos: High-quality isolated images of the actual hardware.
 
+EXTRACTION RULES:
+1. PRODUCT ASSOCIATION: Link every asset to a specific model name and code found in headers or order data tables.
+2. BOUNDING BOXES: Provide inclusive coordinates. For full-page-width diagrams, use xmin: 50, xmax: 950.
+3. INCLUSIVITY: Bounding boxes must include all axes, legends, labels, and captions.
+4. STRICT GROUNDING: Only index assets clearly visible in the document. Exclude decorative elements, logos, or icons.
+5. NO HALLUCINATION: Do not assume diagrams exist if they are not explicitly shown.
+"""
+USER_INSTRUCTION = "Extract the visual asset manifest as JSON."
+OUTPUT_DIR = "output_manifests"
+# Manifests keyed by PDF content hash, so unchanged documents are not re-analyzed
+CACHE_DIR = os.path.join(OUTPUT_DIR, ".cache")
+# Cached manifests are only valid for the model, prompt and schema that produced them
+CONFIG_HASH = hashlib.md5(
+    json.dumps([MODEL_NAME, SYSTEM_PROMPT, RESPONSE_SCHEMA], sort_keys=True).encode()
+).hexdigest()[:12]
+
+# Per-thread state (storage clients wrap an HTTP session, which is not shared across threads)
+_thread_local = threading.local()
+
+@functools.lru_cache(maxsize=1)
 def initialize_vertex_ai():
-    """Initializes the Vertex AI SDK and returns a configured GenerativeModel."""
+    """
+    Initializes the Vertex AI SDK and returns a configured GenerativeModel.
+
+    The model is built once per process and shared by every caller: SDK
+    initialization (credential lookup, channel setup) dominates first-call
+    latency, and generate_content is safe to call from concurrent threads.
+    """
     if not PROJECT_ID:
         print("ERROR: GOOGLE_CLOUD_PROJECT environment variable is not set.")
         sys.exit(1)
+
+    if not STAGING_BUCKET:
+        print("ERROR: STAGING_BUCKET environment variable is not set.")
+        sys.exit(1)
         
     try:
+        import vertexai
+        from vertexai.generative_models import GenerationConfig, GenerativeModel
+
         vertexai.init(project=PROJECT_ID, location=LOCATION)
         
-        # Configure model for structured JSON output
         return GenerativeModel(
             MODEL_NAME,
-            generation_config={"response_mime_type": "application/json"}
+            generation_config=GenerationConfig(**GENERATION_CONFIG),
+            system_instruction=SYSTEM_PROMPT
         )
     except Exception as e:
         print(f"FAILED to initialize Vertex AI: {e}")
         sys.exit(1)
 
-def load_pdf_as_part(path):
-    """Reads a binary PDF file and wraps it in a multimodal Part object."""
-    try:
-        with open(path, "rb") as f:
-            data = f.read()
-        return Part.from_data(mime_type="application/pdf", data=data)
-    except Exception as e:
-        print(f"ERROR reading PDF file: {e}")
+def _file_md5(path, chunk_size=1024 * 1024):
+    """Returns the hex MD5 digest of a file, reading it in fixed-size chunks."""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def get_storage_client():
+    """Returns this thread's Cloud Storage client, creating it on first use."""
+    client = getattr(_thread_local, "storage_client", None)
+    if client is None:
+        from google.cloud import storage
+
+        client = _thread_local.storage_client = storage.Client(project=PROJECT_ID)
+    return client
+
+def stage_pdf(path, digest=None):
+    """
+    Uploads a PDF to the GCS staging bucket under its content hash and returns
+    its gs:// URI. Files already present in the bucket are not uploaded again.
+    """
+    blob_name = f"pdfs/{digest or _file_md5(path)}.pdf"
+    blob = get_storage_client().bucket(STAGING_BUCKET).blob(blob_name)
+    if not blob.exists():
+        blob.upload_from_filename(path, content_type="application/pdf")
+    return f"gs://{STAGING_BUCKET}/{blob_name}"
+
+def build_user_prompt(pdf_path):
+    """Returns the per-PDF user instruction that follows the document."""
+    return f"Source document: {os.path.basename(pdf_path)}\n{USER_INSTRUCTION}"
+
+def upload_pdf_as_part(path, digest=None):
+    """Stages a PDF in GCS and wraps its URI in a multimodal Part object."""
+    from vertexai.generative_models import Part
+
+    return Part.from_uri(stage_pdf(path, digest), mime_type="application/pdf")
+
+def manifest_cache_path(digest):
+    """Returns the cache location of the manifest for a PDF content hash and the current config."""
+    return os.path.join(CACHE_DIR, f"{digest}_{CONFIG_HASH}.json")
+
+def load_cached_manifest(digest):
+    """Returns the cached manifest for a PDF content hash, or None."""
+    cache_path = manifest_cache_path(digest)
+    if not os.path.exists(cache_path):
         return None
+    with open(cache_path) as f:
+        return json.load(f)
+
+def cache_manifest(digest, manifest_data):
+    """Stores a freshly generated manifest under its PDF content hash."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cache_path = manifest_cache_path(digest)
 
-def run_manifest_generation(pdf_path, model):
+    # Write to a temporary file first so readers never see a partial manifest
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest_data, f)
+    os.replace(tmp_path, cache_path)
+
+def parse_manifest(response_text, digest):
+    """Parses a model response into a manifest, stamps it and adds it to the cache."""
+    manifest_data = json.loads(response_text)
+    manifest_data["created_at"] = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+    cache_manifest(digest, manifest_data)
+    return manifest_data
+
+def manifest_filename(pdf_path):
+    """Returns the file name of the manifest saved for a PDF."""
+    return os.path.basename(pdf_path).replace(".pdf", ".json")
+
+def save_manifest(pdf_path, manifest_data, pretty=False):
     """
-    Sends the PDF to Gemini Vision with a specialized prompt to extract 
-    metadata for all technical visual assets.
+    Saves a manifest for the given PDF to the output directory. Manifests are
+    written compactly for machine consumers; `pretty` indents the file and
+    echoes it to the console for review.
     """
-    if not os.path.exists(pdf_path):
-        print(f"ERROR: PDF file not found at {pdf_path}")
-        return
+    # Enforce consistent metadata
+    manifest_data["source_pdf"] = os.path.basename(pdf_path)
 
-    print(f"--- Processing: {pdf_path} ---")
+    # Output to console for verification (a single print keeps concurrent runs readable)
+    if pretty:
+        print(
+            f"\n--- EXTRACTED MANIFEST: {manifest_data['source_pdf']} ---\n\n"
+            f"{json.dumps(manifest_data, indent=2)}\n\n"
+            "--- END OF MANIFEST ---"
+        )
+    else:
+        print(
+            f"\n--- EXTRACTED MANIFEST: {manifest_data['source_pdf']} "
+            f"({len(manifest_data.get('assets', []))} assets) ---"
+        )
 
-    # The System Prompt defines the extraction schema and business rules
-    system_prompt = f"""
-    You are a Computer Vision Metadata Engine for Technical Documentation.
-    Your goal is to analyze the provided PDF and generate a structured "Image Manifest" of all significant visual assets.
+    # Save to output directory
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
     
-    OUTPUT FORMAT (JSON Object):
-    {{
-        "source_pdf": "{os.path.basename(pdf_path)}",
-        "product_name": "<string: Primary product name>",
-        "product_description": "<string: 1-2 sentence technical summary>",
-        "created_at": "ISO-8601-Timestamp", 
-        "assets": [
-            {{
-                "page_number": <int>,
-                "type": "<stats_graph|wiring_diagram|technical_drawing|product_photo>",
-                "model_name": "<string: Specific product variant name>",
-                "product_code": "<string: 12NC or SKU if available>",
-                "description": "<detailed description of the asset content>",
-                "bounding_box": [ymin, xmin, ymax, xmax]
-            }}
-        ]
-    }}
-
-    TARGET ASSET CLASSIFICATIONS:
-    - Wiring Diagrams: Schematics showing electrical connections and terminals.
-    - Dimensional Drawings: Technical sketches providing physical measurements.
-    - Performance Graphs: Charts showing efficiency, operating windows, or spectral response.
-    - Product Photos: High-quality isolated images of the actual hardware.
+    output_path = os.path.join(OUTPUT_DIR, manifest_filename(pdf_path))
     
-    EXTRACTION RULES:
-    1. PRODUCT ASSOCIATION: Link every asset to a specific model name and code found in headers or order data tables.
-    2. BOUNDING BOXES: Provide inclusive coordinates. For full-page-width diagrams, use xmin: 50, xmax: 950.
-    3. INCLUSIVITY: Bounding boxes must include all axes, legends, labels, and captions.
-    4. STRICT GROUNDING: Only index assets clearly visible in the document. Exclude decorative elements, logos, or icons.
-    5. NO HALLUCINATION: Do not assume diagrams exist if they are not explicitly shown.
+    with open(output_path, "w") as f:
+        json.dump(manifest_data, f, indent=2 if pretty else None)
+    
+    print(f"\n✅ SUCCESS: Manifest saved to {output_path}")
+    return output_path
+
+def run_manifest_generation(pdf_path, model, force_refresh=False, pretty=False):
     """
+    Sends the PDF to Gemini Vision with a specialized prompt to extract 
+    metadata for all technical visual assets. PDFs analyzed before are
+    served from the manifest cache unless `force_refresh` is set; `pretty`
+    indents the saved manifest.
 
-    pdf_part = load_pdf_as_part(pdf_path)
-    if not pdf_part:
-        return
+    Returns the path of the saved manifest; raises on failure so that
+    concurrent runs fail independently.
+    """
+    print(f"--- Processing: {pdf_path} ---")
+
+    digest = _file_md5(pdf_path)
+    cached = None if force_refresh else load_cached_manifest(digest)
+    if cached is not None:
+        print(f"Using cached manifest for {pdf_path}")
+        return save_manifest(pdf_path, cached, pretty)
 
-    # Multimodal input: Text prompt + PDF bytes
-    inputs = [system_prompt, pdf_part, "Extract the visual asset manifest as JSON."]
+    # Multimodal input: staged PDF + short per-PDF instruction (the system prompt is set on the model)
+    inputs = [upload_pdf_as_part(pdf_path, digest), build_user_prompt(pdf_path)]
     
     print(f"Requesting multimodal analysis from {MODEL_NAME}...")
     
+    response = model.generate_content(inputs)
+    
+    # The model returns schema-conforming JSON due to the response_schema config
+    return save_manifest(pdf_path, parse_manifest(response.text, digest), pretty)
+
+def _file_uri(request):
+    """Returns the gs:// URI of the PDF referenced by a batch request."""
+    for part in request["contents"][0]["parts"]:
+        # The request echoed in batch output may use either proto JSON spelling
+        file_data = part.get("file_data") or part.get("fileData")
+        if file_data:
+            return file_data.get("file_uri") or file_data.get("fileUri")
+    return None
+
+def run_manifest_generation_batch(pdf_paths, force_refresh=False, pretty=False):
+    """
+    Generates manifests for several PDFs with a single Vertex AI batch
+    prediction job: requests run in parallel server-side at reduced cost,
+    instead of one synchronous round trip per document. PDFs analyzed
+    before are served from the manifest cache unless `force_refresh` is set;
+    `pretty` indents the saved manifests.
+    """
+    from vertexai.batch_prediction import BatchPredictionJob
+
+    run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+
+    # 1. Stage each PDF and build one request per document
+    pdfs_by_uri = {}
+    lines = []
+    for pdf_path in pdf_paths:
+        try:
+            digest = _file_md5(pdf_path)
+            cached = None if force_refresh else load_cached_manifest(digest)
+            if cached is not None:
+                print(f"Using cached manifest for {pdf_path}")
+                save_manifest(pdf_path, cached, pretty)
+                continue
+
+            uri = stage_pdf(pdf_path, digest)
+        except Exception as e:
+            print(f"ERROR staging PDF file {pdf_path}: {e}")
+            continue
+
+        if uri not in pdfs_by_uri:
+            request = {
+                "system_instruction": {"parts": [{"text": SYSTEM_PROMPT}]},
+                "contents": [{
+                    "role": "user",
+                    "parts": [
+                        {"file_data": {"file_uri": uri, "mime_type": "application/pdf"}},
+                        {"text": build_user_prompt(pdf_path)}
+                    ]
+                }],
+                "generation_config": GENERATION_CONFIG
+            }
+            lines.append(json.dumps({"request": request}))
+        pdfs_by_uri.setdefault(uri, []).append((pdf_path, digest))
+
+    if not lines:
+        return
+
     try:
-        response = model.generate_content(inputs)
-        
-        # The model returns a JSON string due to the response_mime_type config
-        manifest_data = json.loads(response.text)
-        
-        # Enforce consistent metadata
-        manifest_data["created_at"] = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
-        manifest_data["source_pdf"] = os.path.basename(pdf_path)
-
-        # Output to console for verification
-        print("\n--- EXTRACTED MANIFEST ---\n")
-        print(json.dumps(manifest_data, indent=2))
-        print("\n--- END OF MANIFEST ---")
-
-        # Save to output directory
-        output_dir = "output_manifests"
-        os.makedirs(output_dir, exist_ok=True)
-        
-        filename = os.path.basename(pdf_path).replace(".pdf", ".json")
-        output_path = os.path.join(output_dir, filename)
-        
-        with open(output_path, "w") as f:
-            json.dump(manifest_data, f, indent=2)
-        
-        print(f"\n✅ SUCCESS: Manifest saved to {output_path}")
+        # 2. Upload the request file next to the job output
+        bucket = get_storage_client().bucket(STAGING_BUCKET)
+        input_blob = bucket.blob(f"batch/{run_id}/requests.jsonl")
+        input_blob.upload_from_string("\n".join(lines), content_type="application/jsonl")
+
+        # 3. Submit the job and wait for it to finish
+        print(f"Submitting batch job for {len(lines)} PDF(s) to {MODEL_NAME}...")
+        job = BatchPredictionJob.submit(
+            source_model=MODEL_NAME,
+            input_dataset=f"gs://{STAGING_BUCKET}/{input_blob.name}",
+            output_uri_prefix=f"gs://{STAGING_BUCKET}/batch/{run_id}/output"
+        )
+        print(f"Batch job: {job.resource_name}")
+
+        while not job.has_ended:
+            time.sleep(BATCH_POLL_SECONDS)
+            job.refresh()
+            print(f"Batch job state: {job.state.name}")
+
+        if not job.has_succeeded:
+            print(f"FAILED batch job: {job.error}")
+            return
+
+        # 4. Fan the predictions out into one manifest per PDF
+        handled_uris = set()
+        output_prefix = job.output_location.removeprefix(f"gs://{STAGING_BUCKET}/")
+        for blob in bucket.list_blobs(prefix=output_prefix):
+            if not blob.name.endswith(".jsonl"):
+                continue
+            for line in blob.download_as_text().splitlines():
+                if not line.strip():
+                    continue
+                # Each record fails on its own, so one bad prediction does not
+                # discard the rest of the (already paid for) job output
+                pdfs = []
+                try:
+                    record = json.loads(line)
+                    uri = _file_uri(record["request"])
+                    pdfs = pdfs_by_uri.get(uri, [])
+                    if not pdfs:
+                        continue
+                    handled_uris.add(uri)
+                    if record.get("status"):
+                        print(f"FAILED to generate manifest for {pdfs[0][0]}: {record['status']}")
+                        continue
+                    text = record["response"]["candidates"][0]["content"]["parts"][0]["text"]
+                    manifest_data = parse_manifest(text, pdfs[0][1])
+                    for pdf_path, _ in pdfs:
+                        save_manifest(pdf_path, dict(manifest_data), pretty)
+                except Exception as e:
+                    pdf = pdfs[0][0] if pdfs else "a batch output record"
+                    print(f"FAILED to generate manifest for {pdf}: {e!r}")
+
+        for uri, pdfs in pdfs_by_uri.items():
+            if uri not in handled_uris:
+                for pdf_path, _ in pdfs:
+                    print(f"FAILED to generate manifest for {pdf_path}: no prediction returned")
 
     except Exception as e:
-        print(f"FAILED to generate manifest: {e}")
+        print(f"FAILED to run batch manifest generation: {e}")
 
 def main():
     parser = argparse.ArgumentParser(
         description="Extract a structured visual asset manifest from a PDF using Google Gemini Vision."
     )
-    parser.add_argument("pdf_path", help="Local path to the PDF datasheet.")
+    parser.add_argument("pdf_paths", nargs="+", help="Local path(s) to the PDF datasheet(s).")
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Process PDFs one synchronous request at a time instead of a batch prediction job."
+    )
+    parser.add_argument(
+        "--force-refresh",
+        action="store_true",
+        help="Re-analyze PDFs even if a cached manifest exists for their content."
+    )
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="Indent the saved manifests and print them to the console."
+    )
     
     args = parser.parse_args()
+
+    # Validate input before paying for the Vertex AI SDK start-up
+    missing = [pdf_path for pdf_path in args.pdf_paths if not os.path.isfile(pdf_path)]
+    for pdf_path in missing:
+        print(f"ERROR: PDF file not found at {pdf_path}")
+    if missing:
+        sys.exit(2)
+
+    # Manifests are named after the PDF file name, so PDFs sharing one would overwrite each other
+    pdfs_by_filename = {}
+    for pdf_path in args.pdf_paths:
+        pdfs_by_filename.setdefault(manifest_filename(pdf_path), []).append(pdf_path)
+    duplicates = [paths for paths in pdfs_by_filename.values() if len(paths) > 1]
+    for paths in duplicates:
+        print(f"ERROR: PDFs would overwrite the same manifest: {', '.join(paths)}")
+    if duplicates:
+        sys.exit(2)
     
     # Initialize SDK
     model = initialize_vertex_ai()
     
-    # Run processing
-    run_manifest_generation(args.pdf_path, model)
+    # A batch job only pays off with several documents; a single PDF stays synchronous
+    if args.sync or len(args.pdf_paths) == 1:
+        # Requests are network-bound, so threads overlap them cleanly
+        workers = min(MAX_WORKERS, len(args.pdf_paths))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    run_manifest_generation, pdf_path, model, args.force_refresh, args.pretty
+                ): pdf_path
+                for pdf_path in args.pdf_paths
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"FAILED to generate manifest for {futures[future]}: {e}")
+    else:
+        run_manifest_generation_batch(args.pdf_paths, args.force_refresh, args.pretty)
 
 if __name__ == "__main__":
     main()